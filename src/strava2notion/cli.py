@@ -1,6 +1,7 @@
 """CLI commands using click."""
 
 import asyncio
+from collections import Counter
 from typing import Any
 
 import click
@@ -46,28 +47,48 @@ async def _sync(settings: Settings, full: bool, dry_run: bool) -> None:
     from strava2notion.notion.sync import ActivitySyncer
     from strava2notion.strava.client import StravaClient
 
-    # Initialize clients
-    notion = NotionClient(settings.notion_token, settings.rate_limit_delay)
-    strava = StravaClient(settings)
-
-    try:
-        # Initialize syncer and load existing activities
+    async with (
+        NotionClient(settings.notion_token, settings.rate_limit_delay) as notion,
+        StravaClient(settings) as strava,
+    ):
         syncer = ActivitySyncer(notion, settings.notion_database_id)
-        await syncer.initialize()
-        click.echo(f"Found {syncer.existing_count} existing activities in Notion")
 
-        # Determine sync start date
-        after_date = None
-        if not full and syncer.most_recent_activity_date:
-            after_date = syncer.most_recent_activity_date
-            click.echo(f"Incremental sync: fetching activities after {after_date.date()}")
-        else:
+        if full:
+            # No start date is needed, so load the Notion index while fetching from Strava
+            syncer.invalidate()
             click.echo("Full sync: fetching all activities")
+            click.echo("\nLoading existing activities and fetching activities from Strava...")
+            # A TaskGroup cancels the other half if either fails; surface the original error
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(syncer.initialize())
+                    fetch = tg.create_task(strava.get_activities())
+            except ExceptionGroup as eg:
+                raise eg.exceptions[0] from None
+            activities = fetch.result()
+            click.echo(f"Found {syncer.existing_count} existing activities in Notion")
+        else:
+            # Initialize syncer and load existing activities
+            await syncer.initialize()
+            click.echo(f"Found {syncer.existing_count} existing activities in Notion")
+
+            # Determine sync start date
+            after_date = syncer.most_recent_activity_date
+            if after_date:
+                click.echo(f"Incremental sync: fetching activities after {after_date.date()}")
+            else:
+                click.echo("Full sync: fetching all activities")
+
+            # Fetch from Strava
+            click.echo("\nFetching activities from Strava...")
+            activities = await strava.get_activities(after=after_date)
 
-        # Fetch from Strava
-        click.echo("\nFetching activities from Strava...")
-        activities = await strava.get_activities(after=after_date)
         click.echo(f"Found {len(activities)} activities from Strava")
+        if strava.missing_read_scope:
+            click.echo(
+                "Note: run 'strava2notion auth' again to grant the 'read' scope "
+                "so full syncs can fetch pages in parallel."
+            )
 
         if not activities:
             click.echo("No new activities to sync.")
@@ -86,15 +107,16 @@ async def _sync(settings: Settings, full: bool, dry_run: bool) -> None:
         click.echo("\nSyncing to Notion...")
 
         def on_progress(activity: Any, action: str) -> None:
-            symbol = "+" if action == "created" else "~"
+            symbol = {"created": "+", "updated": "~"}.get(action, "=")
             click.echo(f"  [{symbol}] {activity.name}")
 
-        counts = await syncer.sync_activities(activities, on_progress=on_progress)
-        click.echo(f"\nSync complete: {counts['created']} created, {counts['updated']} updated")
-
-    finally:
-        await notion.close()
-        await strava.close()
+        counts = await syncer.sync_activities(
+            activities, on_progress=on_progress, concurrency=settings.sync_concurrency
+        )
+        click.echo(
+            f"\nSync complete: {counts['created']} created, {counts['updated']} updated, "
+            f"{counts['skipped']} unchanged"
+        )
 
 
 @main.command()
@@ -110,15 +132,12 @@ def auth(ctx: click.Context) -> None:
         click.echo(f"Error loading settings: {ctx.obj.get('settings_error')}", err=True)
         ctx.exit(1)
 
-    from strava2notion.strava.client import StravaClient
-
     click.echo("Opening browser for Strava authorization...")
     click.echo("(Make sure 'localhost' is set as your Authorization Callback Domain in Strava)")
     click.echo()
 
-    strava = StravaClient(settings)
     try:
-        tokens = strava.authorize()
+        tokens = asyncio.run(_auth(settings))
         click.echo()
         click.echo("Authorization successful!")
         click.echo()
@@ -133,6 +152,14 @@ def auth(ctx: click.Context) -> None:
         ctx.exit(1)
 
 
+async def _auth(settings: Settings) -> dict:
+    """Run the Strava OAuth flow."""
+    from strava2notion.strava.client import StravaClient
+
+    async with StravaClient(settings) as strava:
+        return await strava.authorize()
+
+
 @main.command("init-schema")
 @click.pass_context
 def init_schema(ctx: click.Context) -> None:
@@ -152,8 +179,7 @@ async def _init_schema(settings: Settings) -> None:
 
     click.echo("Updating Notion database schema...")
 
-    client = NotionClient(settings.notion_token)
-    try:
+    async with NotionClient(settings.notion_token) as client:
         db = await client.get_database(settings.notion_database_id)
         title_list = db.get("title", [])
         db_name = title_list[0].get("plain_text", "Unknown") if title_list else "Unknown"
@@ -167,8 +193,6 @@ async def _init_schema(settings: Settings) -> None:
             click.echo(f"  + {name}: {prop_type}")
 
         click.echo("\nDone! Your database now has all required properties.")
-    finally:
-        await client.close()
 
 
 @main.command()
@@ -185,21 +209,25 @@ def status(ctx: click.Context) -> None:
 
 async def _status(settings: Settings) -> None:
     """Show database status."""
-    from strava2notion.notion.client import NotionClient
+    from strava2notion.notion.client import NotionClient, property_ids
 
-    client = NotionClient(settings.notion_token)
-    try:
+    async with NotionClient(settings.notion_token) as client:
         # Get database info
         db = await client.get_database(settings.notion_database_id)
         title_list = db.get("title", [])
         db_name = title_list[0].get("plain_text", "Unknown") if title_list else "Unknown"
 
         # Count activities by type
-        type_counts: dict[str, int] = {}
+        type_counts: Counter[str] = Counter()
         total = 0
         most_recent = None
 
-        async for page in client.query_database_all(settings.notion_database_id):
+        # Only fetch the properties read below
+        pages = client.query_database_all(
+            settings.notion_database_id,
+            filter_properties=property_ids(db, ["Type", "Date"]),
+        )
+        async for page in pages:
             total += 1
             props = page.get("properties", {})
 
@@ -207,7 +235,7 @@ async def _status(settings: Settings) -> None:
             type_prop = props.get("Type", {})
             type_select = type_prop.get("select")
             type_name = type_select.get("name", "Unknown") if type_select else "Unknown"
-            type_counts[type_name] = type_counts.get(type_name, 0) + 1
+            type_counts[type_name] += 1
 
             # Track most recent
             date_prop = props.get("Date", {})
@@ -221,10 +249,8 @@ async def _status(settings: Settings) -> None:
         if most_recent:
             click.echo(f"Most recent: {most_recent[:10]}")
         click.echo("\nActivities by type:")
-        for type_name, count in sorted(type_counts.items(), key=lambda x: -x[1]):
+        for type_name, count in type_counts.most_common():
             click.echo(f"  {type_name}: {count}")
-    finally:
-        await client.close()
 
 
 if __name__ == "__main__":
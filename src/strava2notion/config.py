@@ -25,7 +25,12 @@ class Settings(BaseSettings):
     notion_database_id: str = Field(alias="DATABASE_ID")
 
     # Sync configuration
-    rate_limit_delay: float = Field(default=0.35, description="Seconds between Notion API calls")
+    rate_limit_delay: float = Field(
+        default=0.35, ge=0, description="Average seconds between Notion API calls (0 disables)"
+    )
+    sync_concurrency: int = Field(
+        default=5, ge=1, description="Activities synced to Notion at once"
+    )
 
 
 @lru_cache
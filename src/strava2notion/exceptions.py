@@ -28,7 +28,7 @@ class NotionAPIError(StravaNotionError):
 class RateLimitError(NotionAPIError):
     """Notion API rate limit exceeded."""
 
-    def __init__(self, retry_after: int):
+    def __init__(self, retry_after: float):
         self.retry_after = retry_after
         super().__init__(429, f"Rate limited. Retry after {retry_after}s")
 
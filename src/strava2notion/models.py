@@ -1,28 +1,55 @@
 """Data models for strava2notion."""
 
+import hashlib
+import json
 from datetime import datetime
 from typing import Any
 
-from pydantic import BaseModel, Field, computed_field
+from pydantic import AliasChoices, BaseModel, Field, computed_field, field_validator
+
+
+def properties_hash(properties: dict[str, Any]) -> str:
+    """Short digest of Notion page properties, used to skip no-op updates."""
+    encoded = json.dumps(properties, sort_keys=True).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
 
 
 class Activity(BaseModel):
-    """Represents a Strava activity."""
+    """Represents a Strava activity.
+
+    Fields also accept the Strava API names, so raw API items validate directly.
+    """
 
     # Core identifiers
-    strava_id: int = Field(description="Strava activity ID")
+    strava_id: int = Field(
+        validation_alias=AliasChoices("strava_id", "id"), description="Strava activity ID"
+    )
 
     # Activity metadata
     name: str
-    activity_type: str = Field(description="e.g., Run, Ride, Swim")
+    activity_type: str = Field(
+        validation_alias=AliasChoices("activity_type", "type"), description="e.g., Run, Ride, Swim"
+    )
     start_date_local: datetime
 
     # Metrics
-    distance_meters: float = Field(default=0.0)
-    moving_time_seconds: int = Field(default=0)
+    distance_meters: float = Field(
+        default=0.0, validation_alias=AliasChoices("distance_meters", "distance")
+    )
+    moving_time_seconds: int = Field(
+        default=0, validation_alias=AliasChoices("moving_time_seconds", "moving_time")
+    )
     total_elevation_gain: float = Field(default=0.0)
     weighted_average_watts: int | None = Field(default=None)
 
+    @field_validator("start_date_local", mode="before")
+    @classmethod
+    def _strip_utc_suffix(cls, value: Any) -> Any:
+        """Strava suffixes local times with "Z"; keep them as naive local datetimes."""
+        if isinstance(value, str):
+            return value.replace("Z", "")
+        return value
+
     @computed_field
     @property
     def distance_km(self) -> float:
@@ -63,13 +90,4 @@ class Activity(BaseModel):
     @classmethod
     def from_strava_api(cls, data: dict[str, Any]) -> "Activity":
         """Create Activity from Strava API response."""
-        return cls(
-            strava_id=data["id"],
-            name=data["name"],
-            activity_type=data["type"],
-            start_date_local=datetime.fromisoformat(data["start_date_local"].replace("Z", "")),
-            distance_meters=data.get("distance", 0.0),
-            moving_time_seconds=data.get("moving_time", 0),
-            total_elevation_gain=data.get("total_elevation_gain", 0.0),
-            weighted_average_watts=data.get("weighted_average_watts"),
-        )
+        return cls.model_validate(data)
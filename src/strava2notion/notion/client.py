@@ -1,16 +1,69 @@
 """Async Notion API client."""
 
 import asyncio
+import contextlib
+import random
+import urllib.parse
 from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
+import orjson
 
 from strava2notion.exceptions import NotionAPIError, RateLimitError
 
 NOTION_API_VERSION = "2022-06-28"
 NOTION_BASE_URL = "https://api.notion.com/v1"
 
+# Notion allows short bursts as long as the average stays around 3 requests/second
+RATE_LIMIT_BURST = 3
+
+
+def property_ids(database: dict[str, Any], names: list[str]) -> list[str]:
+    """IDs of the named properties in a database object, skipping missing ones."""
+    properties = database.get("properties", {})
+    # IDs come back URL-encoded; decode so httpx doesn't encode them twice
+    return [urllib.parse.unquote(properties[name]["id"]) for name in names if name in properties]
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter so concurrent retries don't line up."""
+    return (2**attempt) * (0.5 + random.random())
+
+
+class TokenBucket:
+    """Async token bucket that refills at a fixed rate and allows short bursts."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available, then take it."""
+        # Same monotonic clock that asyncio.sleep() is scheduled against
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated_at is not None:
+                    elapsed = now - self._updated_at
+                    self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        return None
+
 
 class NotionClient:
     """Async client for Notion API."""
@@ -18,22 +71,27 @@ class NotionClient:
     def __init__(self, token: str, rate_limit_delay: float = 0.35):
         self.token = token
         self.rate_limit_delay = rate_limit_delay
-        self._client: httpx.AsyncClient | None = None
-        self._last_request_time: float = 0
-
-    def _get_headers(self) -> dict[str, str]:
-        return {
-            "Authorization": f"Bearer {self.token}",
+        self._headers = {
+            "Authorization": f"Bearer {token}",
             "Notion-Version": NOTION_API_VERSION,
             "Content-Type": "application/json",
         }
+        self._client: httpx.AsyncClient | None = None
+        # A delay of 0 disables throttling
+        self._bucket = (
+            TokenBucket(rate=1 / rate_limit_delay, capacity=RATE_LIMIT_BURST)
+            if rate_limit_delay > 0
+            else None
+        )
 
     async def _get_client(self) -> httpx.AsyncClient:
         if self._client is None or self._client.is_closed:
             self._client = httpx.AsyncClient(
                 base_url=NOTION_BASE_URL,
-                headers=self._get_headers(),
+                headers=self._headers,
                 timeout=30.0,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+                http2=True,
             )
         return self._client
 
@@ -42,50 +100,59 @@ class NotionClient:
         if self._client is not None and not self._client.is_closed:
             await self._client.aclose()
 
-    async def _rate_limit(self) -> None:
-        """Enforce rate limiting between requests."""
-        import time
+    async def __aenter__(self) -> "NotionClient":
+        await self._get_client()
+        return self
 
-        now = time.time()
-        elapsed = now - self._last_request_time
-        if elapsed < self.rate_limit_delay:
-            await asyncio.sleep(self.rate_limit_delay - elapsed)
-        self._last_request_time = time.time()
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
 
     async def _request(
         self,
         method: str,
         endpoint: str,
         json: dict[str, Any] | None = None,
+        params: dict[str, Any] | None = None,
         retries: int = 3,
     ) -> dict[str, Any]:
         """Make an API request with retry logic."""
         client = await self._get_client()
-        await self._rate_limit()
 
         for attempt in range(retries):
             try:
-                response = await client.request(method, endpoint, json=json)
+                async with self._bucket or contextlib.nullcontext():
+                    response = await client.request(
+                        method,
+                        endpoint,
+                        content=orjson.dumps(json) if json is not None else None,
+                        params=params,
+                    )
 
                 if response.status_code == 429:
-                    retry_after = int(response.headers.get("retry-after", "1"))
+                    retry_after = float(response.headers.get("retry-after", "1"))
                     if attempt < retries - 1:
-                        await asyncio.sleep(retry_after)
+                        await asyncio.sleep(retry_after + random.uniform(0, 0.5))
                         continue
                     raise RateLimitError(retry_after)
 
+                if response.status_code >= 500 and attempt < retries - 1:
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+
                 if response.status_code >= 400:
-                    error_body = response.json()
-                    raise NotionAPIError(
-                        response.status_code,
-                        error_body.get("message", "Unknown error"),
-                    )
+                    # Gateway errors can come back as HTML rather than Notion's JSON
+                    try:
+                        message = orjson.loads(response.content).get("message", "Unknown error")
+                    except (orjson.JSONDecodeError, AttributeError):
+                        message = response.text or "Unknown error"
+                    raise NotionAPIError(response.status_code, message)
 
-                return response.json()
+                return orjson.loads(response.content)
 
             except httpx.HTTPError as e:
+                # Includes transport failures such as ReadError and RemoteProtocolError
                 if attempt < retries - 1:
-                    await asyncio.sleep(2**attempt)
+                    await asyncio.sleep(backoff_delay(attempt))
                     continue
                 raise NotionAPIError(0, str(e)) from e
 
@@ -97,21 +164,43 @@ class NotionClient:
         start_cursor: str | None = None,
         page_size: int = 100,
         sorts: list[dict[str, Any]] | None = None,
+        filter_: dict[str, Any] | None = None,
+        filter_properties: list[str] | None = None,
     ) -> dict[str, Any]:
-        """Query a database with pagination."""
+        """Query a database with pagination.
+
+        filter_properties limits each returned page to the given property IDs.
+        """
         payload: dict[str, Any] = {"page_size": page_size}
         if start_cursor:
             payload["start_cursor"] = start_cursor
         if sorts:
             payload["sorts"] = sorts
+        if filter_:
+            payload["filter"] = filter_
+        params = {"filter_properties": filter_properties} if filter_properties else None
 
-        return await self._request("POST", f"/databases/{database_id}/query", json=payload)
+        return await self._request(
+            "POST", f"/databases/{database_id}/query", json=payload, params=params
+        )
 
-    async def query_database_all(self, database_id: str) -> AsyncIterator[dict[str, Any]]:
+    async def query_database_all(
+        self,
+        database_id: str,
+        sorts: list[dict[str, Any]] | None = None,
+        filter_: dict[str, Any] | None = None,
+        filter_properties: list[str] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
         """Query all pages from a database, handling pagination."""
         start_cursor = None
         while True:
-            result = await self.query_database(database_id, start_cursor)
+            result = await self.query_database(
+                database_id,
+                start_cursor,
+                sorts=sorts,
+                filter_=filter_,
+                filter_properties=filter_properties,
+            )
             for page in result.get("results", []):
                 yield page
 
@@ -152,3 +241,7 @@ class NotionClient:
     async def get_database(self, database_id: str) -> dict[str, Any]:
         """Get database metadata including schema."""
         return await self._request("GET", f"/databases/{database_id}")
+
+    async def get_property_ids(self, database_id: str, names: list[str]) -> list[str]:
+        """Look up the IDs of the named database properties, skipping missing ones."""
+        return property_ids(await self.get_database(database_id), names)
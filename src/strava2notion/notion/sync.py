@@ -1,12 +1,53 @@
 """Sync logic for upserting activities to Notion."""
 
 import asyncio
+import json
+import os
 from collections.abc import Callable
-from datetime import datetime
+from datetime import UTC, datetime
+from pathlib import Path
 
-from strava2notion.models import Activity
+from strava2notion.exceptions import NotionAPIError
+from strava2notion.models import Activity, properties_hash
 from strava2notion.notion.client import NotionClient
 
+# Bump when the cache file layout changes so stale files are ignored
+CACHE_VERSION = 2
+
+# Rows synced from Strava, newest first
+INDEX_SORTS = [{"property": "Date", "direction": "descending"}]
+INDEX_FILTER = {"property": "Strava ID", "rich_text": {"is_not_empty": True}}
+
+
+def get_cache_dir() -> Path:
+    """Directory for the local lookup index cache (honours XDG_CACHE_HOME)."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "strava2notion"
+
+
+def parse_notion_date(date_str: str) -> datetime | None:
+    """Parse a Notion date string, treating naive values as UTC."""
+    try:
+        # Handle both datetime and date-only formats
+        if "T" in date_str:
+            parsed = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+        else:
+            parsed = datetime.fromisoformat(date_str)
+    except ValueError:
+        return None
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed
+
+
+def page_strava_id(page: dict) -> str:
+    """Strava ID stored on a Notion page, or "" if it has none."""
+    try:
+        return page["properties"]["Strava ID"]["rich_text"][0]["plain_text"]
+    except (KeyError, IndexError):
+        return ""
+
 
 class ActivitySyncer:
     """Handles syncing activities to Notion with upsert logic."""
@@ -15,47 +56,127 @@ class ActivitySyncer:
         self.client = client
         self.database_id = database_id
         self._strava_id_to_page_id: dict[str, str] = {}
+        self._strava_id_to_hash: dict[str, str] = {}
         self._most_recent_date: datetime | None = None
 
     async def initialize(self) -> None:
-        """Initialize sync state by loading existing pages."""
+        """Initialize sync state from the local cache, or by loading existing pages."""
+        if self._load_cache() and await self._cache_is_current():
+            return
+
         await self._build_lookup_index()
+        self._save_cache()
+
+    def invalidate(self) -> None:
+        """Drop the local cache so the next initialize() reloads from Notion."""
+        self._strava_id_to_page_id = {}
+        self._strava_id_to_hash = {}
+        self._most_recent_date = None
+        self._cache_path().unlink(missing_ok=True)
+
+    def _cache_path(self) -> Path:
+        return get_cache_dir() / f"{self.database_id}.json"
+
+    def _load_cache(self) -> bool:
+        """Load the lookup index from the local cache. Returns False on a miss."""
+        try:
+            data = json.loads(self._cache_path().read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return False
+
+        # Valid JSON of the wrong shape is as good as no cache
+        try:
+            pages = data["pages"]
+            page_ids = {sid: entry["page_id"] for sid, entry in pages.items()}
+            hashes = {sid: entry["hash"] for sid, entry in pages.items() if entry.get("hash")}
+            most_recent = data.get("most_recent_date")
+            most_recent_date = parse_notion_date(most_recent) if most_recent else None
+        except (AttributeError, KeyError, TypeError):
+            return False
+
+        self._strava_id_to_page_id = page_ids
+        self._strava_id_to_hash = hashes
+        self._most_recent_date = most_recent_date
+        return True
+
+    async def _cache_is_current(self) -> bool:
+        """Check the loaded cache against the newest synced row in Notion.
+
+        Catches pages written from elsewhere (another machine, a scheduled job)
+        since the cache was saved, at the cost of a single one-row query.
+        """
+        response = await self.client.query_database(
+            self.database_id, page_size=1, sorts=INDEX_SORTS, filter_=INDEX_FILTER
+        )
+        results = response.get("results", [])
+        if not results:
+            return not self._strava_id_to_page_id
+
+        newest = results[0]
+        return self._strava_id_to_page_id.get(page_strava_id(newest)) == newest["id"]
+
+    def _save_cache(self) -> None:
+        """Atomically write the lookup index to the local cache."""
+        path = self._cache_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        data = {
+            "version": CACHE_VERSION,
+            "most_recent_date": (
+                self._most_recent_date.isoformat() if self._most_recent_date else None
+            ),
+            "pages": {
+                sid: {"page_id": page_id, "hash": self._strava_id_to_hash.get(sid)}
+                for sid, page_id in self._strava_id_to_page_id.items()
+            },
+        }
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _note_activity_date(self, activity: Activity) -> None:
+        """Advance the most recent date if this activity is newer."""
+        activity_date = activity.start_date_local
+        if activity_date.tzinfo is None:
+            activity_date = activity_date.replace(tzinfo=UTC)
+
+        if self._most_recent_date is None or activity_date > self._most_recent_date:
+            self._most_recent_date = activity_date
 
     async def _build_lookup_index(self) -> None:
         """Load all existing pages and build lookup index."""
         self._strava_id_to_page_id = {}
+        self._strava_id_to_hash = {}
         self._most_recent_date = None
 
-        async for page in self.client.query_database_all(self.database_id):
-            props = page.get("properties", {})
-            page_id = page["id"]
+        # Only rows with a Strava ID, newest first, carrying just the properties read below
+        property_ids = await self.client.get_property_ids(self.database_id, ["Strava ID", "Date"])
+        pages = self.client.query_database_all(
+            self.database_id,
+            sorts=INDEX_SORTS,
+            filter_=INDEX_FILTER,
+            filter_properties=property_ids,
+        )
+        async for page in pages:
+            props = page["properties"]
 
             # Index by Strava ID
-            strava_id_prop = props.get("Strava ID", {})
-            rich_text = strava_id_prop.get("rich_text", [])
-            if rich_text:
-                strava_id = rich_text[0].get("plain_text", "")
-                if strava_id:
-                    self._strava_id_to_page_id[strava_id] = page_id
-
-            # Track most recent date
-            date_prop = props.get("Date", {})
-            date_val = date_prop.get("date")
-            if date_val and date_val.get("start"):
+            strava_id = page_strava_id(page)
+            if strava_id:
+                self._strava_id_to_page_id[strava_id] = page["id"]
+
+            # Rows arrive newest first, so the first dated row is the most recent
+            # (the "date" value is null when unset)
+            if self._most_recent_date is None:
                 try:
-                    date_str = date_val["start"]
-                    # Handle both datetime and date-only formats
-                    if "T" in date_str:
-                        activity_date = datetime.fromisoformat(
-                            date_str.replace("Z", "+00:00")
-                        )
-                    else:
-                        activity_date = datetime.fromisoformat(date_str)
-
-                    if self._most_recent_date is None or activity_date > self._most_recent_date:
-                        self._most_recent_date = activity_date
-                except ValueError:
-                    pass
+                    date_str = props["Date"]["date"]["start"]
+                except (KeyError, TypeError):
+                    date_str = None
+                if date_str:
+                    self._most_recent_date = parse_notion_date(date_str)
 
     def _find_existing_page(self, activity: Activity) -> str | None:
         """Find existing page ID for an activity."""
@@ -66,43 +187,88 @@ class ActivitySyncer:
         Sync a single activity to Notion.
 
         Returns:
-            Tuple of (page_id, action) where action is "created" or "updated"
+            Tuple of (page_id, action) where action is "created", "updated" or "skipped"
         """
+        strava_id = str(activity.strava_id)
         properties = activity.to_notion_properties()
+        new_hash = properties_hash(properties)
         existing_page_id = self._find_existing_page(activity)
 
         if existing_page_id:
-            await self.client.update_page(existing_page_id, properties)
-            return existing_page_id, "updated"
-        else:
-            result = await self.client.create_page(self.database_id, properties)
-            new_id = result["id"]
-            self._strava_id_to_page_id[str(activity.strava_id)] = new_id
-            return new_id, "created"
+            # Nothing changed since we last wrote this page
+            if self._strava_id_to_hash.get(strava_id) == new_hash:
+                return existing_page_id, "skipped"
+
+            try:
+                await self.client.update_page(existing_page_id, properties)
+            except NotionAPIError as e:
+                # Archived (400) or deleted (404) since it was indexed; recreate below
+                if e.status_code not in (400, 404):
+                    raise
+                del self._strava_id_to_page_id[strava_id]
+            else:
+                self._strava_id_to_hash[strava_id] = new_hash
+                self._note_activity_date(activity)
+                return existing_page_id, "updated"
+
+        result = await self.client.create_page(self.database_id, properties)
+        new_id = result["id"]
+        self._strava_id_to_page_id[strava_id] = new_id
+        self._strava_id_to_hash[strava_id] = new_hash
+        self._note_activity_date(activity)
+        return new_id, "created"
 
     async def sync_activities(
         self,
         activities: list[Activity],
         on_progress: Callable[[Activity, str], None] | None = None,
+        concurrency: int = 5,
     ) -> dict[str, int]:
         """
-        Sync multiple activities.
+        Sync multiple activities concurrently.
 
         Args:
             activities: List of activities to sync
-            on_progress: Optional callback called with (activity, action)
+            on_progress: Optional callback called with (activity, action) as each finishes
+            concurrency: Maximum number of activities in flight at once
 
         Returns:
-            Dict with counts: {"created": N, "updated": N}
+            Dict with counts: {"created": N, "updated": N, "skipped": N}
         """
-        counts = {"created": 0, "updated": 0}
+        counts = {"created": 0, "updated": 0, "skipped": 0}
+        semaphore = asyncio.Semaphore(concurrency)
+        # Tasks past the semaphore, whose writes may already have reached Notion
+        started: set[asyncio.Task] = set()
+
+        async def sync_one(activity: Activity) -> tuple[Activity, str]:
+            async with semaphore:
+                task = asyncio.current_task()
+                if task is not None:
+                    started.add(task)
+                _, action = await self.sync_activity(activity)
+            return activity, action
+
+        # Two concurrent creates for the same Strava ID would both miss the index and
+        # produce duplicate pages, so only the last copy of each activity is synced
+        unique_activities = {activity.strava_id: activity for activity in activities}
 
-        for activity in activities:
-            _, action = await self.sync_activity(activity)
-            counts[action] += 1
+        tasks = [asyncio.create_task(sync_one(activity)) for activity in unique_activities.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                activity, action = await next_done
+                counts[action] += 1
 
-            if on_progress:
-                on_progress(activity, action)
+                if on_progress:
+                    on_progress(activity, action)
+        finally:
+            # If one of the syncs failed, drop the queued ones but let those already
+            # writing to Notion finish, so every page they create reaches the index
+            for task in tasks:
+                if task not in started:
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Keep whatever was created so a rerun doesn't duplicate pages
+            self._save_cache()
 
         return counts
 
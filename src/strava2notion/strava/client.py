@@ -1,12 +1,17 @@
 """Strava API client with token refresh."""
 
-import http.server
-import threading
+import asyncio
+import math
+import random
+import time
 import urllib.parse
 import webbrowser
+from collections import deque
 from datetime import datetime
 
 import httpx
+import orjson
+from pydantic import TypeAdapter
 
 from strava2notion.config import Settings
 from strava2notion.exceptions import StravaAPIError, StravaAuthError
@@ -16,6 +21,40 @@ STRAVA_AUTH_URL = "https://www.strava.com/oauth/authorize"
 STRAVA_TOKEN_URL = "https://www.strava.com/oauth/token"
 STRAVA_API_BASE = "https://www.strava.com/api/v3"
 
+# Max concurrent Strava requests
+STRAVA_CONCURRENCY = 8
+
+# Pages kept in flight while paginating past the known history; the most a
+# listing overshoots its end by is PAGE_WINDOW - 1 empty pages
+PAGE_WINDOW = 4
+
+# Retries for throttled (429) or failed (5xx) requests, and the longest wait between them
+MAX_RETRIES = 5
+MAX_RETRY_DELAY = 60.0
+
+# Validates a whole page of Strava activities in one call
+ACTIVITY_LIST_ADAPTER = TypeAdapter(list[Activity])
+
+# Refresh this many seconds before the access token actually expires
+TOKEN_EXPIRY_MARGIN = 60
+
+# Seconds a connection to the OAuth callback server gets to send its request line
+CALLBACK_READ_TIMEOUT = 10.0
+
+
+def retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring Retry-After, with jitter."""
+    try:
+        delay = float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        delay = 2**attempt
+    return min(MAX_RETRY_DELAY, delay) + random.random() * 0.5
+
+
+def parse_activities(content: bytes) -> list[Activity]:
+    """Decode and validate one page of activities straight from the JSON body."""
+    return ACTIVITY_LIST_ADAPTER.validate_json(content)
+
 
 class StravaClient:
     """Async client for Strava API using token refresh."""
@@ -23,12 +62,26 @@ class StravaClient:
     def __init__(self, settings: Settings):
         self.settings = settings
         self._access_token: str | None = None
+        self._auth_headers: dict[str, str] = {}
+        self._token_expiry: float | None = None
         self._client: httpx.AsyncClient | None = None
+        self._semaphore = asyncio.Semaphore(STRAVA_CONCURRENCY)
+        self._refresh_lock = asyncio.Lock()
+        # Set when the token can't read the athlete profile (granted before "read" was requested)
+        self.missing_read_scope = False
 
     async def _get_client(self) -> httpx.AsyncClient:
         """Get or create HTTP client."""
         if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(timeout=30.0)
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(
+                    max_connections=STRAVA_CONCURRENCY,
+                    max_keepalive_connections=STRAVA_CONCURRENCY,
+                    keepalive_expiry=30.0,
+                ),
+                http2=True,
+            )
         return self._client
 
     async def close(self) -> None:
@@ -36,12 +89,17 @@ class StravaClient:
         if self._client is not None and not self._client.is_closed:
             await self._client.aclose()
 
+    async def __aenter__(self) -> "StravaClient":
+        await self._get_client()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
     async def _refresh_token(self) -> str:
         """Refresh access token using refresh token."""
         if not self.settings.strava_refresh_token:
-            raise StravaAuthError(
-                "No refresh token configured. Run 'strava2notion auth' first."
-            )
+            raise StravaAuthError("No refresh token configured. Run 'strava2notion auth' first.")
 
         client = await self._get_client()
 
@@ -56,22 +114,45 @@ class StravaClient:
                 },
             )
 
-            if response.status_code != 200:
-                raise StravaAuthError(
-                    f"Token refresh failed ({response.status_code}): {response.text}"
-                )
+            response.raise_for_status()
 
-            data = response.json()
+            data = orjson.loads(response.content)
             self._access_token = data["access_token"]
+            # Replaced rather than mutated, since in-flight requests may still hold the old one
+            self._auth_headers = {"Authorization": f"Bearer {self._access_token}"}
+            expires_at = data.get("expires_at")
+            self._token_expiry = expires_at - TOKEN_EXPIRY_MARGIN if expires_at else None
             return self._access_token
 
+        except httpx.HTTPStatusError as e:
+            raise StravaAuthError(
+                f"Token refresh failed ({e.response.status_code}): {e.response.text}"
+            ) from e
         except httpx.HTTPError as e:
             raise StravaAuthError(f"Token refresh request failed: {e}") from e
 
-    async def _get_access_token(self) -> str:
-        """Get valid access token, refreshing if needed."""
-        if self._access_token is None:
-            return await self._refresh_token()
+    async def _get_access_token(self, stale_token: str | None = None) -> str:
+        """
+        Get valid access token, refreshing if needed.
+
+        Tokens are refreshed shortly before they expire. Pass the token a request was
+        rejected with as stale_token to force a refresh. Concurrent callers share a
+        single refresh.
+        """
+        token = self._valid_token(stale_token)
+        if token:
+            return token
+
+        async with self._refresh_lock:
+            # Another request may have refreshed the token while we waited
+            return self._valid_token(stale_token) or await self._refresh_token()
+
+    def _valid_token(self, stale_token: str | None = None) -> str | None:
+        """Current access token, or None if it is missing, stale or about to expire."""
+        if self._access_token is None or self._access_token == stale_token:
+            return None
+        if self._token_expiry is not None and time.time() >= self._token_expiry:
+            return None
         return self._access_token
 
     async def _request(
@@ -79,122 +160,183 @@ class StravaClient:
         method: str,
         endpoint: str,
         params: dict | None = None,
+        refresh_on_401: bool = True,
     ) -> dict | list:
         """Make authenticated API request."""
-        client = await self._get_client()
-        token = await self._get_access_token()
-
-        try:
-            response = await client.request(
-                method,
-                f"{STRAVA_API_BASE}{endpoint}",
-                params=params,
-                headers={"Authorization": f"Bearer {token}"},
-            )
-
-            if response.status_code == 401:
-                # Token expired, refresh and retry
-                token = await self._refresh_token()
-                response = await client.request(
-                    method,
-                    f"{STRAVA_API_BASE}{endpoint}",
-                    params=params,
-                    headers={"Authorization": f"Bearer {token}"},
-                )
-
-            if response.status_code >= 400:
-                raise StravaAPIError(
-                    f"Strava API error ({response.status_code}): {response.text}"
-                )
-
-            return response.json()
+        return orjson.loads(await self._request_raw(method, endpoint, params, refresh_on_401))
 
-        except httpx.HTTPError as e:
-            raise StravaAPIError(f"Strava API request failed: {e}") from e
+    async def _request_object(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict | None = None,
+        refresh_on_401: bool = True,
+    ) -> dict:
+        """Make authenticated API request to an endpoint that returns a JSON object."""
+        data = await self._request(method, endpoint, params, refresh_on_401)
+        if not isinstance(data, dict):
+            raise StravaAPIError(f"Strava API returned {type(data).__name__} for {endpoint}")
+        return data
+
+    async def _request_raw(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict | None = None,
+        refresh_on_401: bool = True,
+    ) -> bytes:
+        """Make authenticated API request, returning the undecoded response body.
 
-    def authorize(self, port: int = 8000) -> dict:
+        Pass refresh_on_401=False when a 401 means a missing scope rather than an
+        expired token, so it fails fast instead of refreshing and retrying.
+        """
+        async with self._semaphore:
+            client = await self._get_client()
+            token = await self._get_access_token()
+            url = f"{STRAVA_API_BASE}{endpoint}"
+            headers = self._auth_headers
+
+            async def send() -> httpx.Response:
+                return await client.request(method, url, params=params, headers=headers)
+
+            try:
+                response = await send()
+
+                if response.status_code == 401 and refresh_on_401:
+                    # Token expired or revoked early; refresh and retry
+                    token = await self._get_access_token(stale_token=token)
+                    headers = self._auth_headers
+                    response = await send()
+
+                # Back off while still holding the semaphore so retries don't add load
+                for attempt in range(MAX_RETRIES):
+                    if response.status_code != 429 and response.status_code < 500:
+                        break
+                    await asyncio.sleep(retry_delay(response, attempt))
+                    response = await send()
+
+                response.raise_for_status()
+                return response.content
+
+            except httpx.HTTPStatusError as e:
+                message = f"Strava API error ({e.response.status_code}): {e.response.text}"
+                if e.response.status_code in (401, 403):
+                    raise StravaAuthError(message) from e
+                raise StravaAPIError(message) from e
+            except httpx.HTTPError as e:
+                raise StravaAPIError(f"Strava API request failed: {e}") from e
+
+    async def authorize(self, port: int = 8000) -> dict:
         """
         Run OAuth flow to get new tokens with proper scopes.
 
         Opens browser for user authorization, then exchanges code for tokens.
         Returns dict with access_token and refresh_token.
         """
-        auth_code: str | None = None
-        error: str | None = None
-
-        class CallbackHandler(http.server.BaseHTTPRequestHandler):
-            def do_GET(self):
-                nonlocal auth_code, error
-                parsed = urllib.parse.urlparse(self.path)
-                params = urllib.parse.parse_qs(parsed.query)
-
-                if "code" in params:
-                    auth_code = params["code"][0]
-                    self.send_response(200)
-                    self.send_header("Content-type", "text/html")
-                    self.end_headers()
-                    self.wfile.write(b"<h1>Authorization successful!</h1>")
-                    self.wfile.write(b"<p>You can close this window.</p>")
-                elif "error" in params:
-                    error = params.get("error_description", params["error"])[0]
-                    self.send_response(400)
-                    self.send_header("Content-type", "text/html")
-                    self.end_headers()
-                    self.wfile.write(f"<h1>Error: {error}</h1>".encode())
-                else:
-                    self.send_response(400)
-                    self.end_headers()
-
-            def log_message(self, format, *args):
-                pass  # Suppress logging
+        loop = asyncio.get_running_loop()
+        callback: asyncio.Future[dict[str, list[str]]] = loop.create_future()
+        # Open connections, closed on shutdown so idle browser sockets can't stall wait_closed()
+        writers: set[asyncio.StreamWriter] = set()
+
+        async def on_connect(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            writers.add(writer)
+            try:
+                await handle_request(reader, writer)
+            finally:
+                writers.discard(writer)
+                writer.close()
+
+        async def handle_request(
+            reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+            # Only the request line matters, e.g. "GET /callback?code=... HTTP/1.1"
+            try:
+                request_line = await asyncio.wait_for(
+                    reader.readuntil(b"\r\n"), timeout=CALLBACK_READ_TIMEOUT
+                )
+            except (TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+
+            parts = request_line.decode("latin-1").split()
+            target = parts[1] if len(parts) > 1 else ""
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(target).query)
+
+            if "code" in params:
+                status = "200 OK"
+                body = b"<h1>Authorization successful!</h1><p>You can close this window.</p>"
+            elif "error" in params:
+                error = params.get("error_description", params["error"])[0]
+                status = "400 Bad Request"
+                body = f"<h1>Error: {error}</h1>".encode()
+            else:
+                # e.g. the browser asking for /favicon.ico; keep waiting for the callback
+                status = "400 Bad Request"
+                body = b""
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/html\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+
+            if ("code" in params or "error" in params) and not callback.done():
+                callback.set_result(params)
 
         # Build authorization URL
         auth_params = {
             "client_id": self.settings.strava_client_id,
             "redirect_uri": f"http://localhost:{port}/callback",
             "response_type": "code",
-            "scope": "activity:read_all",
+            "scope": "read,activity:read_all",
         }
         auth_url = f"{STRAVA_AUTH_URL}?{urllib.parse.urlencode(auth_params)}"
 
-        # Start local server
-        server = http.server.HTTPServer(("localhost", port), CallbackHandler)
-        server.timeout = 120  # 2 minute timeout
-
-        # Open browser
-        webbrowser.open(auth_url)
-
-        # Wait for callback
-        server.handle_request()
-        server.server_close()
-
-        if error:
+        # Listen before opening the browser so a fast redirect can't beat the server.
+        # Launching the browser can block, so do it off the event loop.
+        server = await asyncio.start_server(on_connect, "localhost", port)
+        try:
+            await asyncio.to_thread(webbrowser.open, auth_url)
+            params = await asyncio.wait_for(callback, timeout=120)  # 2 minute timeout
+        except TimeoutError:
+            raise StravaAuthError("No authorization code received") from None
+        finally:
+            server.close()
+            for writer in writers:
+                writer.close()
+            await server.wait_closed()
+
+        if "error" in params:
+            error = params.get("error_description", params["error"])[0]
             raise StravaAuthError(f"Authorization failed: {error}")
-        if not auth_code:
-            raise StravaAuthError("No authorization code received")
 
         # Exchange code for tokens
-        with httpx.Client() as client:
-            response = client.post(
+        client = await self._get_client()
+        try:
+            response = await client.post(
                 STRAVA_TOKEN_URL,
                 data={
                     "client_id": self.settings.strava_client_id,
                     "client_secret": self.settings.strava_client_secret,
-                    "code": auth_code,
+                    "code": params["code"][0],
                     "grant_type": "authorization_code",
                 },
             )
+        except httpx.HTTPError as e:
+            raise StravaAuthError(f"Token exchange request failed: {e}") from e
 
-            if response.status_code != 200:
-                raise StravaAuthError(f"Token exchange failed: {response.text}")
+        if response.status_code != 200:
+            raise StravaAuthError(f"Token exchange failed: {response.text}")
 
-            return response.json()
+        return orjson.loads(response.content)
 
     async def get_activities(
         self,
         after: datetime | None = None,
         before: datetime | None = None,
-        per_page: int = 100,
+        per_page: int = 200,
     ) -> list[Activity]:
         """
         Fetch activities from Strava.
@@ -202,7 +344,7 @@ class StravaClient:
         Args:
             after: Only fetch activities after this date
             before: Only fetch activities before this date
-            per_page: Number of activities per page (max 200)
+            per_page: Number of activities per page (defaults to Strava's max of 200)
 
         Returns:
             List of Activity models
@@ -214,22 +356,70 @@ class StravaClient:
         if before:
             params["before"] = int(before.timestamp())
 
-        activities = []
-        page = 1
+        activities: list[Activity] = []
+        in_flight: deque[asyncio.Task[list[Activity]]] = deque()
+        next_page = 1
 
-        while True:
-            params["page"] = page
-            data = await self._request("GET", "/athlete/activities", params=params)
+        def prefetch(count: int) -> None:
+            nonlocal next_page
+            for _ in range(count):
+                in_flight.append(asyncio.create_task(self._fetch_page(params, next_page)))
+                next_page += 1
 
-            if not data:
-                break
+        # Most incremental syncs fit in one page, so only open the window once a full
+        # page comes back
+        prefetch(1)
+        try:
+            if after is None and before is None:
+                # Whole history: request every page we know exists in one burst
+                prefetch(await self._estimate_page_count(per_page) - 1)
 
-            for item in data:
-                activities.append(Activity.from_strava_api(item))
+            while in_flight:
+                page_activities = await in_flight.popleft()
+                activities.extend(page_activities)
 
-            if len(data) < per_page:
-                break
+                if len(page_activities) < per_page:
+                    break
 
-            page += 1
+                # Once the estimated burst drains, keep PAGE_WINDOW pages in flight
+                prefetch(PAGE_WINDOW - len(in_flight))
+        finally:
+            # Pages past the first short one are empty
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
 
         return activities
+
+    async def _estimate_page_count(self, per_page: int) -> int:
+        """
+        Lower bound on the number of activity pages, from the athlete's lifetime totals.
+
+        Strava's stats only count public rides, runs and swims, so the real history
+        is at least this long. Returns 1 if the stats can't be read.
+        """
+        # The token was just validated, so a 401 here is a missing scope, not expiry
+        try:
+            athlete = await self._request_object("GET", "/athlete", refresh_on_401=False)
+            stats = await self._request_object(
+                "GET", f"/athletes/{athlete['id']}/stats", refresh_on_401=False
+            )
+        except StravaAuthError:
+            self.missing_read_scope = True
+            return 1
+        except StravaAPIError:
+            return 1
+
+        total = sum(
+            stats.get(key, {}).get("count", 0)
+            for key in ("all_ride_totals", "all_run_totals", "all_swim_totals")
+        )
+        return math.ceil(total / per_page)
+
+    async def _fetch_page(self, params: dict, page: int) -> list[Activity]:
+        """Fetch and parse a single page of activities."""
+        content = await self._request_raw(
+            "GET", "/athlete/activities", params={**params, "page": page}
+        )
+        # Parse in a worker thread so the event loop keeps servicing other page downloads
+        return await asyncio.to_thread(parse_activities, content)
@@ -0,0 +1,33 @@
+"""Tests for the Notion API client."""
+
+import httpx
+import pytest
+
+from strava2notion.exceptions import NotionAPIError
+from strava2notion.notion.client import NOTION_BASE_URL, NotionClient
+
+
+def make_client(handler, rate_limit_delay: float = 0) -> NotionClient:
+    """NotionClient whose HTTP calls are answered by handler."""
+    client = NotionClient("secret", rate_limit_delay)
+    client._client = httpx.AsyncClient(
+        base_url=NOTION_BASE_URL, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+async def test_zero_rate_limit_delay_disables_throttling():
+    async with make_client(lambda request: httpx.Response(200, json={"id": "db"})) as client:
+        assert await client.get_database("db") == {"id": "db"}
+
+
+async def test_non_json_error_body_raises_notion_api_error(monkeypatch):
+    monkeypatch.setattr("strava2notion.notion.client.backoff_delay", lambda attempt: 0)
+    html = "<html><body>502 Bad Gateway</body></html>"
+
+    async with make_client(lambda request: httpx.Response(502, text=html)) as client:
+        with pytest.raises(NotionAPIError) as exc_info:
+            await client.get_database("db")
+
+    assert exc_info.value.status_code == 502
+    assert "502 Bad Gateway" in str(exc_info.value)
@@ -0,0 +1,249 @@
+"""Tests for the Strava API client."""
+
+import asyncio
+import socket
+import time
+from datetime import UTC, datetime
+
+import httpx
+import pytest
+
+from strava2notion.config import Settings
+from strava2notion.exceptions import StravaAPIError
+from strava2notion.strava.client import (
+    MAX_RETRIES,
+    MAX_RETRY_DELAY,
+    PAGE_WINDOW,
+    StravaClient,
+    retry_delay,
+)
+
+
+class FakeStrava:
+    """Strava API serving a fixed number of activities, recording each request."""
+
+    def __init__(
+        self,
+        activity_count: int,
+        stats_count: int,
+        has_read_scope: bool = True,
+        page_delay: float = 0.0,
+    ):
+        self.activity_count = activity_count
+        self.stats_count = stats_count
+        self.has_read_scope = has_read_scope
+        self.page_delay = page_delay
+        self.paths: list[str] = []
+        self.pages: list[int] = []
+        self.pages_in_flight = 0
+        self.peak_pages_in_flight = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.paths.append(path)
+
+        if path == "/oauth/token":
+            return httpx.Response(
+                200, json={"access_token": "token", "expires_at": int(time.time()) + 3600}
+            )
+        if path == "/api/v3/athlete" and not self.has_read_scope:
+            return httpx.Response(401, json={"message": "Authorization Error"})
+        if path == "/api/v3/athlete":
+            return httpx.Response(200, json={"id": 42})
+        if path == "/api/v3/athletes/42/stats":
+            return httpx.Response(200, json={"all_run_totals": {"count": self.stats_count}})
+        if path == "/api/v3/athlete/activities":
+            page = int(request.url.params["page"])
+            per_page = int(request.url.params["per_page"])
+            self.pages.append(page)
+            self.pages_in_flight += 1
+            self.peak_pages_in_flight = max(self.peak_pages_in_flight, self.pages_in_flight)
+            await asyncio.sleep(self.delay_for(page))
+            self.pages_in_flight -= 1
+            start = (page - 1) * per_page
+            ids = range(start, min(start + per_page, self.activity_count))
+            return httpx.Response(
+                200,
+                json=[
+                    {
+                        "id": i,
+                        "name": f"Run {i}",
+                        "type": "Run",
+                        "start_date_local": "2024-05-01T07:30:00Z",
+                    }
+                    for i in ids
+                ],
+            )
+        return httpx.Response(404, json={"message": "Not found"})
+
+    def delay_for(self, page: int) -> float:
+        return self.page_delay
+
+
+@pytest.fixture
+def settings():
+    return Settings(
+        CLIENT_ID="client",
+        CLIENT_SECRET="secret",
+        STRAVA_REFRESH_TOKEN="refresh",
+        TOKEN_V3="notion",
+        DATABASE_ID="db",
+    )
+
+
+def make_client(settings: Settings, strava: FakeStrava) -> StravaClient:
+    client = StravaClient(settings)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(strava.handler))
+    return client
+
+
+async def fetch(settings: Settings, strava: FakeStrava, **kwargs) -> list:
+    async with make_client(settings, strava) as client:
+        return await client.get_activities(**kwargs)
+
+
+async def test_full_history_bursts_the_estimated_pages(settings):
+    strava = FakeStrava(activity_count=1000, stats_count=1000, page_delay=0.01)
+
+    activities = await fetch(settings, strava)
+
+    # 1000 / 200 = 5 full pages, all requested at once; page 6 is the first short one
+    assert len(activities) == 1000
+    assert strava.peak_pages_in_flight >= 5
+    assert max(strava.pages) <= 6 + PAGE_WINDOW - 1
+    assert strava.paths.count("/api/v3/athlete") == 1
+
+
+async def test_history_past_the_estimate_keeps_a_bounded_window(settings):
+    strava = FakeStrava(activity_count=2000, stats_count=400, page_delay=0.01)
+
+    activities = await fetch(settings, strava)
+
+    # Page 11 is the first short (empty) one
+    assert len(activities) == 2000
+    assert strava.peak_pages_in_flight == PAGE_WINDOW
+    assert sorted(set(strava.pages))[:11] == list(range(1, 12))
+    assert max(strava.pages) <= 11 + PAGE_WINDOW - 1
+
+
+async def test_incremental_sync_pages_through_a_bounded_window(settings):
+    strava = FakeStrava(activity_count=450, stats_count=300, page_delay=0.01)
+
+    activities = await fetch(settings, strava, after=datetime(2024, 1, 1, tzinfo=UTC))
+
+    # Page 1 alone, then PAGE_WINDOW pages once it comes back full; page 3 is short
+    assert len(activities) == 450
+    assert strava.pages[0] == 1
+    assert strava.peak_pages_in_flight == PAGE_WINDOW
+    assert max(strava.pages) <= 3 + PAGE_WINDOW - 1
+    assert "/api/v3/athlete" not in strava.paths
+
+
+async def test_window_keeps_page_order_and_collects_stragglers(settings):
+    class LaterPagesFirst(FakeStrava):
+        def delay_for(self, page: int) -> float:
+            return 0.05 / page
+
+    strava = LaterPagesFirst(activity_count=1100, stats_count=0)
+
+    activities = await fetch(settings, strava, after=datetime(2024, 1, 1, tzinfo=UTC))
+
+    assert [activity.strava_id for activity in activities] == list(range(1100))
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+async def test_missing_read_scope_skips_estimate_without_refreshing(settings):
+    strava = FakeStrava(activity_count=450, stats_count=300, has_read_scope=False)
+
+    async with make_client(settings, strava) as client:
+        activities = await client.get_activities()
+
+    assert len(activities) == 450
+    assert client.missing_read_scope
+    assert strava.paths.count("/oauth/token") == 1
+    assert strava.paths.count("/api/v3/athlete") == 1
+
+
+async def http_get(port: int, target: str) -> bytes:
+    reader, writer = await asyncio.open_connection("localhost", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def test_authorize_serves_callback_and_shuts_down(settings, monkeypatch):
+    opened: list[str] = []
+    monkeypatch.setattr("strava2notion.strava.client.webbrowser.open", opened.append)
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+
+    strava = FakeStrava(activity_count=0, stats_count=0)
+    async with make_client(settings, strava) as client:
+        authorize = asyncio.create_task(client.authorize(port=port))
+        while not opened:
+            await asyncio.sleep(0.01)
+
+        # A speculative browser connection that never sends a request
+        _, idle_writer = await asyncio.open_connection("localhost", port)
+        assert (await http_get(port, "/favicon.ico")).startswith(b"HTTP/1.1 400")
+        assert (await http_get(port, "/callback?code=x")).startswith(b"HTTP/1.1 200")
+
+        tokens = await asyncio.wait_for(authorize, timeout=5)
+        idle_writer.close()
+
+    assert tokens["access_token"] == "token"
+    assert "redirect_uri=http%3A%2F%2Flocalhost%3A" in opened[0]
+    with pytest.raises(OSError):
+        await asyncio.open_connection("localhost", port)
+
+
+def token_then(responses: list[httpx.Response], paths: list[str]):
+    """Handler answering token refreshes, then API calls with responses in order."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/oauth/token":
+            return httpx.Response(
+                200, json={"access_token": "token", "expires_at": int(time.time()) + 3600}
+            )
+        paths.append(request.url.path)
+        return responses.pop(0)
+
+    return handler
+
+
+def retrying_client(settings: Settings, handler, monkeypatch) -> StravaClient:
+    monkeypatch.setattr("strava2notion.strava.client.retry_delay", lambda response, attempt: 0)
+    client = StravaClient(settings)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+async def test_throttled_request_succeeds_on_retry(settings, monkeypatch):
+    paths: list[str] = []
+    responses = [httpx.Response(429), httpx.Response(200, json={"id": 42})]
+
+    async with retrying_client(settings, token_then(responses, paths), monkeypatch) as client:
+        assert await client._request("GET", "/athlete") == {"id": 42}
+
+    assert paths == ["/api/v3/athlete", "/api/v3/athlete"]
+
+
+async def test_server_errors_exhaust_retries(settings, monkeypatch):
+    paths: list[str] = []
+    responses = [httpx.Response(503, text="Service Unavailable")] * (MAX_RETRIES + 1)
+
+    async with retrying_client(settings, token_then(responses, paths), monkeypatch) as client:
+        with pytest.raises(StravaAPIError, match="503"):
+            await client._request("GET", "/athlete")
+
+    assert len(paths) == MAX_RETRIES + 1
+
+
+def test_retry_delay_honours_numeric_retry_after():
+    assert 7 <= retry_delay(httpx.Response(429, headers={"Retry-After": "7"}), 0) < 7.5
+    capped = retry_delay(httpx.Response(429, headers={"Retry-After": "900"}), 0)
+    assert MAX_RETRY_DELAY <= capped < MAX_RETRY_DELAY + 0.5
+    assert 4 <= retry_delay(httpx.Response(503), 2) < 4.5
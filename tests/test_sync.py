@@ -0,0 +1,191 @@
+"""Tests for the Notion activity syncer and its local cache."""
+
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+
+from strava2notion.exceptions import NotionAPIError
+from strava2notion.models import Activity
+from strava2notion.notion.client import NOTION_BASE_URL, NotionClient
+from strava2notion.notion.sync import ActivitySyncer
+
+
+class FakeNotion:
+    """In-memory Notion database answering the requests ActivitySyncer makes."""
+
+    def __init__(self):
+        self.rows: list[dict] = []
+        self.requests: list[tuple[str, str, dict]] = []
+        self.archived: set[str] = set()
+        self.rejected_names: set[str] = set()
+        self.create_delay = 0.0
+
+    def add_row(self, strava_id: int, date: str) -> str:
+        page_id = f"page-{len(self.rows)}"
+        self.rows.append(
+            {
+                "id": page_id,
+                "properties": {
+                    "Strava ID": {"rich_text": [{"plain_text": str(strava_id)}]},
+                    "Date": {"date": {"start": date}},
+                },
+            }
+        )
+        return page_id
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        self.requests.append((request.method, request.url.path, body))
+
+        if request.method == "GET" and request.url.path == "/v1/databases/db":
+            return httpx.Response(
+                200, json={"properties": {"Strava ID": {"id": "sid"}, "Date": {"id": "date"}}}
+            )
+        if request.url.path == "/v1/databases/db/query":
+            rows = sorted(
+                self.rows, key=lambda r: r["properties"]["Date"]["date"]["start"], reverse=True
+            )
+            return httpx.Response(
+                200, json={"results": rows[: body["page_size"]], "has_more": False}
+            )
+        if request.method == "POST" and request.url.path == "/v1/pages":
+            if body["properties"]["Name"]["title"][0]["text"]["content"] in self.rejected_names:
+                return httpx.Response(400, json={"message": "Invalid property value."})
+            await asyncio.sleep(self.create_delay)
+            strava_id = body["properties"]["Strava ID"]["rich_text"][0]["text"]["content"]
+            date = body["properties"]["Date"]["date"]["start"]
+            return httpx.Response(200, json={"id": self.add_row(int(strava_id), date)})
+        if request.method == "PATCH":
+            page_id = request.url.path.rsplit("/", 1)[-1]
+            if page_id in self.archived:
+                return httpx.Response(400, json={"message": "Can't edit block that is archived."})
+            return httpx.Response(200, json={"id": page_id})
+        return httpx.Response(404, json={"message": "Not found"})
+
+    def count(self, method: str, path: str, page_size: int | None = None) -> int:
+        return sum(
+            1
+            for m, p, body in self.requests
+            if m == method and p == path and (page_size is None or body["page_size"] == page_size)
+        )
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    return tmp_path / "strava2notion"
+
+
+@pytest.fixture
+def notion():
+    return FakeNotion()
+
+
+def make_syncer(notion: FakeNotion) -> ActivitySyncer:
+    client = NotionClient("secret", rate_limit_delay=0)
+    client._client = httpx.AsyncClient(
+        base_url=NOTION_BASE_URL, transport=httpx.MockTransport(notion.handler)
+    )
+    return ActivitySyncer(client, "db")
+
+
+def make_activity(strava_id: int, name: str = "Morning Run") -> Activity:
+    return Activity(
+        strava_id=strava_id,
+        name=name,
+        activity_type="Run",
+        start_date_local=datetime(2024, 5, strava_id, 7, 30),
+    )
+
+
+async def test_cache_round_trip_skips_full_query(notion):
+    notion.add_row(1, "2024-05-01T07:30:00")
+
+    first = make_syncer(notion)
+    await first.initialize()
+    assert notion.count("POST", "/v1/databases/db/query", page_size=100) == 1
+    await first.sync_activities([make_activity(2)])
+
+    second = make_syncer(notion)
+    await second.initialize()
+    assert notion.count("POST", "/v1/databases/db/query", page_size=100) == 1
+    assert notion.count("POST", "/v1/databases/db/query", page_size=1) == 1
+    assert second.existing_count == 2
+    assert second.most_recent_activity_date == datetime.fromisoformat("2024-05-02T07:30:00+00:00")
+
+
+async def test_unchanged_activity_is_skipped(notion):
+    syncer = make_syncer(notion)
+    await syncer.initialize()
+
+    assert await syncer.sync_activities([make_activity(1)]) == {
+        "created": 1,
+        "updated": 0,
+        "skipped": 0,
+    }
+    requests_before = len(notion.requests)
+
+    reloaded = make_syncer(notion)
+    await reloaded.initialize()
+    counts = await reloaded.sync_activities([make_activity(1), make_activity(1, "Renamed")])
+    assert counts == {"created": 0, "updated": 1, "skipped": 0}
+
+    counts = await reloaded.sync_activities([make_activity(1, "Renamed")])
+    assert counts == {"created": 0, "updated": 0, "skipped": 1}
+    assert notion.count("PATCH", "/v1/pages/page-0") == 1
+    assert len(notion.requests) == requests_before + 2
+
+
+async def test_cache_rebuilt_when_notion_has_newer_rows(notion):
+    notion.add_row(1, "2024-05-01T07:30:00")
+    await make_syncer(notion).initialize()
+
+    # Synced from elsewhere after the cache was written
+    notion.add_row(2, "2024-05-02T07:30:00")
+
+    syncer = make_syncer(notion)
+    await syncer.initialize()
+    assert notion.count("POST", "/v1/databases/db/query", page_size=100) == 2
+    assert syncer.existing_count == 2
+
+    counts = await syncer.sync_activities([make_activity(2)])
+    assert counts["created"] == 0
+    assert notion.count("POST", "/v1/pages") == 0
+
+
+async def test_wrong_shape_cache_is_a_miss(notion, cache_dir):
+    cache_dir.mkdir(parents=True)
+    (cache_dir / "db.json").write_text(json.dumps({"version": 2, "pages": ["not", "a", "map"]}))
+    notion.add_row(1, "2024-05-01T07:30:00")
+
+    syncer = make_syncer(notion)
+    await syncer.initialize()
+    assert syncer.existing_count == 1
+
+
+async def test_archived_page_is_recreated(notion):
+    page_id = notion.add_row(1, "2024-05-01T07:30:00")
+    notion.archived.add(page_id)
+
+    syncer = make_syncer(notion)
+    await syncer.initialize()
+    page_id, action = await syncer.sync_activity(make_activity(1, "Renamed"))
+
+    assert action == "created"
+    assert page_id != "page-0"
+
+
+async def test_failed_sync_keeps_pages_created_alongside_it(notion, cache_dir):
+    notion.rejected_names.add("Broken")
+    notion.create_delay = 0.05
+
+    syncer = make_syncer(notion)
+    await syncer.initialize()
+    with pytest.raises(NotionAPIError):
+        await syncer.sync_activities([make_activity(1), make_activity(2, "Broken")])
+
+    cache = json.loads((cache_dir / "db.json").read_text())
+    assert list(cache["pages"]) == ["1"]